@@ -0,0 +1,358 @@
+"""
+On-demand profiling van losse requests (voor trage pagina's in productie).
+
+Staat standaard uit: de middleware wordt alleen geregistreerd als er een
+ABC_PROFILE_KEY of ABC_PROFILE_SAMPLE_RATE is ingesteld, dus zonder config is
+er geen enkele overhead.
+
+Een request wordt geprofileerd als:
+- de header X-Profile-Key gelijk is aan ABC_PROFILE_KEY, of
+- ?profile=<verloopt>.<signature> klopt en nog niet verlopen is (HMAC van
+  verlooptijd + pad met ABC_PROFILE_KEY), of
+- hij willekeurig getrokken wordt (ABC_PROFILE_SAMPLE_RATE, bv. 0.01 = 1%).
+
+Profileren gebeurt met een sampler-thread (sys._current_frames) die elke paar
+ms alleen de threads van dít request opneemt: de threadpool-thread waarin de
+route draait (fetch_orders, build_pick_rows, Jinja rendering) en de event-loop
+thread. Welke thread de route draait wordt bijgehouden via een contextvar die
+een wrapper om de endpoints vult. Andere, gelijktijdige requests tellen dus niet mee.
+Het resultaat gaat als collapsed stacks (flamegraph.pl / speedscope formaat)
+naar een roterende map op disk.
+
+Bekijken (alleen met X-Profile-Key header, zodat de sleutel niet in logs/URL's komt):
+    /_profiles                  lijst
+    /_profiles/{id}             call tree (tekst)
+    /_profiles/{id}?format=folded  collapsed stacks voor een flame graph
+
+Signed link maken (geldig voor 1 uur, of het opgegeven aantal seconden):
+    python -m app.core.profiling /picklijsten [3600]
+"""
+
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set
+
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.routing import APIRoute
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_DIR = os.path.join(".cache", "profiles")
+DEFAULT_KEEP = 100
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_LINK_TTL = 60 * 60
+
+
+def _settings() -> dict:
+    def _float(name: str, default: float) -> float:
+        try:
+            return float(os.getenv(name, "").strip() or default)
+        except ValueError:
+            return default
+
+    return {
+        "key": os.getenv("ABC_PROFILE_KEY", "").strip(),
+        "sample_rate": max(0.0, min(1.0, _float("ABC_PROFILE_SAMPLE_RATE", 0.0))),
+        "dir": os.getenv("ABC_PROFILE_DIR", "").strip() or DEFAULT_DIR,
+        "keep": int(_float("ABC_PROFILE_KEEP", DEFAULT_KEEP)),
+        "interval": _float("ABC_PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS) / 1000.0,
+    }
+
+
+def profile_signature(key: str, path: str, expires: int) -> str:
+    payload = f"{expires}:{path}".encode("utf-8")
+    return hmac.new(key.encode("utf-8"), payload, hashlib.sha256).hexdigest()[:32]
+
+
+def profile_link_param(key: str, path: str, ttl: int = DEFAULT_LINK_TTL) -> str:
+    """
+    Waarde voor ?profile=: verlooptijd (unix seconden) + handtekening.
+    """
+    expires = int(time.time()) + ttl
+    return f"{expires}.{profile_signature(key, path, expires)}"
+
+
+def _same(given: str, expected: str) -> bool:
+    # compare_digest weigert str met niet-ASCII tekens; als bytes vergelijken
+    return hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8"))
+
+
+# Threads die bij het geprofileerde request horen (None = request wordt niet geprofileerd)
+_profile_threads: ContextVar[Optional[Set[int]]] = ContextVar("profile_threads", default=None)
+
+
+def _track_thread(call):
+    """
+    Wrapper om een sync endpoint: meldt de threadpool-thread aan bij het lopende profiel.
+    """
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        threads = _profile_threads.get()
+        if threads is None:
+            return call(*args, **kwargs)
+
+        ident = threading.get_ident()
+        threads.add(ident)
+        try:
+            return call(*args, **kwargs)
+        finally:
+            threads.discard(ident)
+
+    return wrapper
+
+
+# -------------------------
+# Sampler
+# -------------------------
+
+class StackSampler:
+    """
+    Neemt periodiek de stacks van de opgegeven threads op en telt ze (collapsed stacks).
+    Alleen stacks met app-code tellen mee; alles boven de eerste app-frame
+    (uvicorn/starlette/anyio) wordt weggelaten.
+    """
+
+    def __init__(self, interval: float, threads: Set[int]):
+        self.interval = interval
+        self.threads = threads
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.threads):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._collapse(frame)
+                if stack:
+                    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(frame) -> Optional[str]:
+        names: List[str] = []
+        in_app_at = None
+        while frame is not None:
+            code = frame.f_code
+            if code.co_filename.startswith(APP_DIR) and "profiling" not in code.co_filename:
+                in_app_at = len(names)
+            module = frame.f_globals.get("__name__", "?")
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+
+        if in_app_at is None:
+            return None
+
+        # names staat van binnen naar buiten; afkappen bij de buitenste app-frame
+        return ";".join(reversed(names[: in_app_at + 1]))
+
+
+# -------------------------
+# Opslag (roterend)
+# -------------------------
+
+def _save(settings: dict, meta: dict, stacks: Dict[str, int]) -> str:
+    folder = settings["dir"]
+    os.makedirs(folder, exist_ok=True)
+
+    profile_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    with open(os.path.join(folder, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+        json.dump({**meta, "id": profile_id, "stacks": stacks}, f)
+
+    # Oudste profielen weggooien
+    files = sorted(n for n in os.listdir(folder) if n.endswith(".json"))
+    for name in files[: max(0, len(files) - settings["keep"])]:
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            pass
+
+    return profile_id
+
+
+def _load(settings: dict, profile_id: str) -> Optional[dict]:
+    # Alleen ids zoals _save ze maakt (geen paden)
+    if not all(c.isalnum() or c == "-" for c in profile_id):
+        return None
+    path = os.path.join(settings["dir"], f"{profile_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _call_tree(profile: dict) -> str:
+    tree: dict = {}
+    total = 0
+    for stack, count in profile.get("stacks", {}).items():
+        total += count
+        node = tree
+        for name in stack.split(";"):
+            entry = node.setdefault(name, {"count": 0, "children": {}})
+            entry["count"] += count
+            node = entry["children"]
+
+    lines = [
+        f"{profile.get('method')} {profile.get('path')} • {profile.get('duration_ms')} ms • "
+        f"{profile.get('samples')} samples",
+        "",
+    ]
+
+    def walk(node: dict, depth: int):
+        for name, entry in sorted(node.items(), key=lambda kv: -kv[1]["count"]):
+            pct = 100.0 * entry["count"] / total if total else 0.0
+            lines.append(f"{'  ' * depth}{pct:5.1f}%  {entry['count']:>5}  {name}")
+            walk(entry["children"], depth + 1)
+
+    walk(tree, 0)
+    return "\n".join(lines)
+
+
+# -------------------------
+# Middleware + admin routes
+# -------------------------
+
+def _is_admin(request: Request, key: str) -> bool:
+    if not key:
+        return False
+    return _same(request.headers.get("x-profile-key", ""), key)
+
+
+def _wants_profile(request: Request, key: str) -> bool:
+    if not key:
+        return False
+    if _same(request.headers.get("x-profile-key", ""), key):
+        return True
+    expires, _, sig = request.query_params.get("profile", "").partition(".")
+    if not expires.isdigit() or not sig or int(expires) < time.time():
+        return False
+    return _same(sig, profile_signature(key, request.url.path, int(expires)))
+
+
+router = APIRouter(include_in_schema=False)
+
+
+@router.get("/_profiles")
+def profiles_list(request: Request):
+    settings = _settings()
+    if not _is_admin(request, settings["key"]):
+        return PlainTextResponse("Not found", status_code=404)
+
+    folder = settings["dir"]
+    names = sorted((n for n in os.listdir(folder) if n.endswith(".json")), reverse=True) if os.path.isdir(folder) else []
+    out = []
+    for name in names:
+        profile = _load(settings, name[:-5]) or {}
+        out.append({k: profile.get(k) for k in ("id", "method", "path", "duration_ms", "samples", "reason")})
+    return JSONResponse(out)
+
+
+@router.get("/_profiles/{profile_id}")
+def profiles_detail(request: Request, profile_id: str, format: str = "tree"):
+    settings = _settings()
+    if not _is_admin(request, settings["key"]):
+        return PlainTextResponse("Not found", status_code=404)
+
+    profile = _load(settings, profile_id)
+    if not profile:
+        return PlainTextResponse("Not found", status_code=404)
+
+    if format == "folded":
+        body = "\n".join(f"{stack} {count}" for stack, count in profile["stacks"].items())
+        return PlainTextResponse(body)
+    return PlainTextResponse(_call_tree(profile))
+
+
+def install(app: FastAPI):
+    """
+    Registreer profiling alleen als het geconfigureerd is (anders: niets, dus geen overhead).
+    """
+    settings = _settings()
+    if not settings["key"] and not settings["sample_rate"]:
+        return
+
+    app.include_router(router)
+
+    # Sync endpoints draaien in de threadpool; zo weten we welke thread bij het request hoort
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+            route.dependant.call = _track_thread(route.dependant.call)
+
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        if request.url.path.startswith(("/_profiles", "/static")):
+            return await call_next(request)
+
+        reason = None
+        if _wants_profile(request, settings["key"]):
+            reason = "requested"
+        elif settings["sample_rate"] and random.random() < settings["sample_rate"]:
+            reason = "sampled"
+
+        if reason is None:
+            return await call_next(request)
+
+        # Event-loop thread + (via _track_thread) de thread van de route
+        threads = {threading.get_ident()}
+        token = _profile_threads.set(threads)
+        sampler = StackSampler(settings["interval"], threads)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            sampler.stop()
+            _profile_threads.reset(token)
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        meta = {
+            "method": request.method,
+            "path": request.url.path,
+            "duration_ms": duration_ms,
+            "samples": sampler.samples,
+            "interval_ms": settings["interval"] * 1000,
+            "reason": reason,
+            "created_at": time.time(),
+        }
+        try:
+            profile_id = _save(settings, meta, sampler.stacks)
+            response.headers["X-Profile-Id"] = profile_id
+        except OSError:
+            pass
+
+        return response
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    key = os.getenv("ABC_PROFILE_KEY", "").strip()
+    if not key or len(sys.argv) < 2 or (len(sys.argv) > 2 and not sys.argv[2].isdigit()):
+        raise SystemExit("Gebruik: ABC_PROFILE_KEY=... python -m app.core.profiling /pad [seconden]")
+    path = sys.argv[1]
+    ttl = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LINK_TTL
+    print(f"{path}?profile={profile_link_param(key, path, ttl)}")
@@ -7,6 +7,7 @@ from fastapi.responses import RedirectResponse, FileResponse
 
 from app.routes.orders import router as orders_router
 from app.routes.picklists import router as picklists_router
+from app.core.profiling import install as install_profiling
 
 app = FastAPI(title="ABC Dashboard")
 
@@ -26,3 +27,7 @@ def healthz():
 @app.get("/favicon.ico", include_in_schema=False)
 def favicon():
     return FileResponse("app/static/favicon.ico")
+
+# Als laatste, zodat alle routes hierboven ook meegenomen worden.
+# Alleen actief als ABC_PROFILE_KEY / ABC_PROFILE_SAMPLE_RATE gezet is
+install_profiling(app)
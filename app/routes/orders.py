@@ -3,87 +3,12 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 from app.services.shopify import ShopifyClient, fetch_orders, get_order_pick_name
+from app.services.projection import project_order
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 
-def _shipping_method(order: dict) -> str:
-    lines = order.get("shipping_lines") or []
-    titles = [(l.get("title") or "").strip() for l in lines]
-    titles = [t for t in titles if t]
-    if titles:
-        return ", ".join(titles)
-    return "Afhalen / Pickup"
-
-
-def _customer_name_from_order(order: dict) -> str:
-    """
-    Fallback klantnaam bepalen zonder extra API call.
-    """
-    customer = order.get("customer") or {}
-    shipping_address = order.get("shipping_address") or {}
-    billing_address = order.get("billing_address") or {}
-
-    # 1) Shopify customer first/last (als aanwezig)
-    first = (customer.get("first_name") or "").strip()
-    last = (customer.get("last_name") or "").strip()
-    full = (first + " " + last).strip()
-    if full:
-        return full
-
-    # 2) B2B / zakelijke klant: company uit default_address (als aanwezig in order payload)
-    default_addr = customer.get("default_address") or {}
-    company = (default_addr.get("company") or "").strip()
-    if company:
-        return company
-
-    # 3) shipping address: name of first/last
-    name = (shipping_address.get("name") or "").strip()
-    if name:
-        return name
-    sfirst = (shipping_address.get("first_name") or "").strip()
-    slast = (shipping_address.get("last_name") or "").strip()
-    sfull = (sfirst + " " + slast).strip()
-    if sfull:
-        return sfull
-
-    # 4) billing address: name of first/last
-    bname = (billing_address.get("name") or "").strip()
-    if bname:
-        return bname
-    bfirst = (billing_address.get("first_name") or "").strip()
-    blast = (billing_address.get("last_name") or "").strip()
-    bfull = (bfirst + " " + blast).strip()
-    if bfull:
-        return bfull
-
-    # 5) order-level email (staat vaak op order, ook bij guest checkout)
-    order_email = (order.get("email") or order.get("contact_email") or "").strip()
-    if order_email:
-        return order_email
-
-    return ""
-
-
-def _customer_name(order: dict) -> str:
-    """
-    Definitieve klantnaam:
-    1) pick_klantnaam (verrijkt door fetch_orders via metafield custom.pick_klantnaam)
-    2) fallback uit order payload
-    3) '-' als alles leeg is
-    """
-    mf = (order.get("pick_klantnaam") or "").strip()
-    if mf:
-        return mf
-
-    name = _customer_name_from_order(order)
-    if name:
-        return name
-
-    return "-"
-
-
 @router.get("/orders", response_class=HTMLResponse)
 def orders_page(request: Request):
     shop_key = request.query_params.get("shop") or "abc-led"
@@ -93,15 +18,16 @@ def orders_page(request: Request):
 
     rows = []
     for o in orders:
+        p = project_order(o)
         rows.append(
             {
-                "id": o.get("id"),
-                "name": o.get("name"),
-                "created_at": o.get("created_at"),
-                "total_price": o.get("total_price"),
-                "currency": o.get("currency"),
-                "customer": _customer_name(o),
-                "shipping": _shipping_method(o),
+                "id": p["id"],
+                "name": p["name"],
+                "created_at": p["created_at"],
+                "total_price": p["total_price"],
+                "currency": p["currency"],
+                "customer": p["account_name"],
+                "shipping": p["shipping_label"],
             }
         )
 
@@ -125,7 +51,7 @@ def orders_refresh(request: Request):
 
     try:
         # Zelfde bron gebruiken als /orders zodat refresh exact hetzelfde gedrag heeft
-        orders = fetch_orders(shop=shop_key, limit=50)
+        orders = fetch_orders(shop=shop_key, limit=50, force=True)
 
         count = len(orders) if orders else 0
         msg = f"Orders opgehaald: {count}"
@@ -165,58 +91,23 @@ def order_detail(request: Request, order_id: int):
             status_code=404,
         )
 
-    # Klantnaam: 1 snelle GraphQL call voor alleen deze order
+    # Klantnaam: metafield (gedeelde cache of 1 snelle GraphQL call voor alleen deze order)
     try:
-        customer_name = get_order_pick_name(shop=shop_key, order_id=order_id) or "-"
+        pick_name = get_order_pick_name(shop=shop_key, order_id=order_id)
     except Exception:
-        customer_name = "-"
-
-    # (optionele) fallback als metafield leeg is
-    if customer_name == "-":
-        cust = order.get("customer") or {}
-        ship = order.get("shipping_address") or {}
-        bill = order.get("billing_address") or {}
-
-        first = (cust.get("first_name") or "").strip()
-        last = (cust.get("last_name") or "").strip()
-        full = (first + " " + last).strip()
-        if full:
-            customer_name = full
-        elif (ship.get("name") or "").strip():
-            customer_name = ship["name"].strip()
-        elif (bill.get("name") or "").strip():
-            customer_name = bill["name"].strip()
-
-    # Status
-    financial_status = (order.get("financial_status") or "-").replace("_", " ").title()
-    fulfillment_status = (order.get("fulfillment_status") or "unfulfilled").replace("_", " ").title()
-
-    created_at = order.get("created_at") or "-"
-    currency = order.get("currency") or "EUR"
-
-    def to_float(x):
-        try:
-            return float(str(x))
-        except Exception:
-            return 0.0
-
-    subtotal = to_float(order.get("subtotal_price"))
-    tax = to_float(order.get("total_tax"))
-    discounts = to_float(order.get("total_discounts"))
-    total = to_float(order.get("total_price"))
-
-    shipping_lines = order.get("shipping_lines") or []
-    shipping = sum(to_float(sl.get("price")) for sl in shipping_lines)
+        pick_name = None
+    if pick_name:
+        order["pick_klantnaam"] = pick_name
 
-    # Als subtotal ontbreekt, bereken uit regels
-    if subtotal == 0.0:
-        line_items = order.get("line_items") or []
-        subtotal = sum(to_float(li.get("price")) * int(li.get("quantity") or 0) for li in line_items)
+    # Naam, status en bedragen uit dezelfde projectie als /orders en /picklijsten
+    p = project_order(order)
+    customer_name = p["account_name"]
+    money = p["money"]
 
     note = (order.get("note") or "").strip() or None
     tags = (order.get("tags") or "").strip() or None
 
-    shipping_method = _shipping_method(order)
+    shipping_method = p["shipping_label"]
 
     fulfillments_raw = order.get("fulfillments") or []
     fulfillments = []
@@ -241,17 +132,17 @@ def order_detail(request: Request, order_id: int):
             "active_shop": shop_key,
             "customer_name": customer_name,
             "status": {
-                "financial": f"Betaling: {financial_status}",
-                "fulfillment": f"Fulfillment: {fulfillment_status}",
+                "financial": f"Betaling: {p['financial_status']}",
+                "fulfillment": f"Fulfillment: {p['fulfillment_status']}",
             },
-            "created_at": created_at,
+            "created_at": p["created_at"] or "-",
             "money": {
-                "currency": currency,
-                "subtotal": f"{subtotal:.2f}",
-                "shipping": f"{shipping:.2f}",
-                "discounts": f"{discounts:.2f}",
-                "tax": f"{tax:.2f}",
-                "total": f"{total:.2f}",
+                "currency": money["currency"],
+                "subtotal": f"{money['subtotal']:.2f}",
+                "shipping": f"{money['shipping']:.2f}",
+                "discounts": f"{money['discounts']:.2f}",
+                "tax": f"{money['tax']:.2f}",
+                "total": f"{money['total']:.2f}",
             },
             "tags": tags,
             "note": note,
@@ -1,18 +1,71 @@
+import csv
+import io
+from datetime import datetime
+
 from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 
 from app.services.shopify import fetch_orders
 from app.services.picking import build_pick_rows
+from app.services.picklist_snapshots import diff_rows, get_snapshot_store, order_hashes
+from app.services.waves import build_wave_rows
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 
+def _snapshot_label(snapshot: dict) -> str:
+    ts = datetime.fromtimestamp(snapshot["created_at"]).strftime("%d-%m-%Y %H:%M")
+    return f"#{snapshot['id']} ({ts})"
+
+
 @router.get("/picklijsten", response_class=HTMLResponse)
-def picklijsten(request: Request, shop: str = "abc-led"):
-    orders = fetch_orders(shop=shop)
-    rows = build_pick_rows(orders)
+def picklijsten(
+    request: Request,
+    shop: str = "abc-led",
+    since: str = "",
+    snapshot: int = 0,
+    view: str = "orders",
+    refresh: int = 0,
+):
+    """
+    refresh=1 (knop "Vernieuwen") haalt de orders altijd opnieuw op i.p.v. uit de gedeelde cache.
+    """
+    store = get_snapshot_store()
+    delta = None
+    base = None
+    pending_id = 0
+    waves = None
+
+    if snapshot:
+        # Eerdere print opnieuw tonen
+        rows = store.load_rows(shop, snapshot) or []
+    elif view == "wave" and not since:
+        # Wave view: per MPN over alle open orders, incrementeel bijgehouden vanuit de orders zelf
+        orders = fetch_orders(shop=shop, force=bool(refresh))
+        waves = build_wave_rows(shop, orders)
+        rows = []
+    else:
+        orders = fetch_orders(shop=shop, force=bool(refresh))
+        rows = build_pick_rows(orders)
+
+        # Precies wat nu getoond wordt vastleggen; de Print knop markeert deze snapshot als geprint.
+        # Ook in delta mode de volledige lijst: de niet-getoonde orders stonden al op een eerdere print.
+        # Ongewijzigde lijst: save() hergebruikt de vorige snapshot i.p.v. er weer een te schrijven.
+        hashes = order_hashes(rows)
+        pending_id = store.save(shop, rows, printed=False, hashes=hashes)
+
+        # "Nieuw sinds laatste print": alleen nieuwe/gewijzigde orders tonen
+        if since:
+            if since == "last":
+                base = store.latest(shop)
+            elif since.isdigit():
+                base = store.get(shop, int(since))
+
+            if base:
+                delta = diff_rows(rows, base["hashes"], hashes)
+                rows = delta["rows"]
 
     return templates.TemplateResponse(
         "picklists.html",
@@ -20,8 +73,66 @@ def picklijsten(request: Request, shop: str = "abc-led"):
             "request": request,
             "shop": shop,
             "rows": rows,
-            "row_count": len(rows),
+            "row_count": sum(w["order_count"] for w in waves) if waves is not None else len(rows),
+            "view": "wave" if waves is not None else "orders",
+            "waves": waves,
+            "since": since,
+            "snapshot_id": snapshot,
+            "pending_id": pending_id,
+            "delta": delta,
+            "base_label": _snapshot_label(base) if base else None,
+            "snapshots": [
+                {**s, "label": _snapshot_label(s)} for s in store.list(shop)
+            ],
             "active_page": "picklijsten",
             "active_shop": shop,
         },
     )
+
+
+@router.post("/picklijsten/printed")
+def picklijsten_printed(shop: str = "abc-led", id: int = 0):
+    """
+    Wordt aangeroepen door de Print knop met het id van de getoonde snapshot,
+    zodat "nieuw sinds laatste print" de volgende keer alleen het verschil laat zien.
+    Er wordt bewust niet opnieuw opgehaald: alleen wat echt op papier stond telt.
+    """
+    if not id or not get_snapshot_store().mark_printed(shop, id):
+        return JSONResponse({"ok": False}, status_code=404)
+    return JSONResponse({"ok": True, "id": id})
+
+
+@router.get("/picklijsten/export.csv")
+def picklijsten_export(shop: str = "abc-led", view: str = "orders", refresh: int = 0):
+    """
+    CSV export van de picklijst (view=orders) of de wave view per MPN (view=wave).
+    Met refresh=1 (de knop op de pagina) altijd actuele orders.
+    """
+    orders = fetch_orders(shop=shop, force=bool(refresh))
+
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";")
+
+    if view == "wave":
+        writer.writerow(["MPN", "Product", "Totaal", "Order", "Klant", "Aantal", "Verzendmethode"])
+        for w in build_wave_rows(shop, orders):
+            for e in w["orders"]:
+                writer.writerow(
+                    [w["mpn"], w["product_name"], w["total_qty"],
+                     e["order_number"], e["customer_name"], e["qty"], e["shipping_method"]]
+                )
+    else:
+        rows = build_pick_rows(orders)
+        writer.writerow(["Order", "Klant", "MPN", "Aantal", "Product", "Prijs", "Subtotaal", "Verzendmethode"])
+        for r in rows:
+            writer.writerow(
+                [r["order_number"], r["customer_name"], r["mpn"], r["qty"], r["product_name"],
+                 f"{r['unit_price']:.2f}", f"{r['order_subtotal']:.2f}", r["shipping_method"]]
+            )
+
+    filename = f"picklijst-{shop}-{view}-{datetime.now():%Y%m%d-%H%M}.csv"
+    return Response(
+        content=buf.getvalue(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
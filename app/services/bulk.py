@@ -0,0 +1,346 @@
+"""
+Backfill van (veel) historische orders via Shopify Bulk Operations.
+
+In plaats van honderden REST pagina's via list_orders:
+1) bulkOperationRunQuery starten
+2) pollen tot de operatie klaar is
+3) het JSONL resultaat streamend inlezen en per order wegschrijven
+
+Het JSONL bestand wordt regel voor regel gelezen; alleen de order die op dat
+moment wordt opgebouwd staat in het geheugen (Shopify schrijft child-regels,
+zoals lineItems, normaal direct na hun parent met een __parentId). Children die
+daar niet bij passen worden apart bewaard en, als ze niet te koppelen zijn,
+gemeld met een OrphanedLineItemsError.
+
+Gebruik:
+    python -m app.services.bulk --shop abc-led --since 2026-01-01 --out exports/orders.jsonl
+
+Offline testen kan door {PREFIX}_SHOPIFY_BASE_URL / SHOPIFY_BASE_URL naar een
+lokale fake Shopify server te laten wijzen (zie tests/test_bulk.py).
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from app.services.shopify import ShopifyClient
+
+POLL_INTERVAL = 5
+POLL_TIMEOUT = 60 * 60
+
+ORDERS_BULK_QUERY = """
+{
+  orders(query: "%(filter)s", sortKey: CREATED_AT) {
+    edges {
+      node {
+        id
+        legacyResourceId
+        name
+        createdAt
+        updatedAt
+        email
+        currencyCode
+        displayFinancialStatus
+        displayFulfillmentStatus
+        subtotalPriceSet { shopMoney { amount } }
+        totalPriceSet { shopMoney { amount } }
+        totalTaxSet { shopMoney { amount } }
+        shippingLine { title }
+        lineItems {
+          edges {
+            node {
+              id
+              title
+              sku
+              quantity
+              originalUnitPriceSet { shopMoney { amount } }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def _iso_date(value: str) -> str:
+    """
+    Alleen YYYY-MM-DD toestaan; de waarde komt in de (gequote) Shopify search query.
+    """
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise ValueError(f"Ongeldige datum '{value}', verwacht YYYY-MM-DD")
+
+
+def _date_arg(value: str) -> str:
+    try:
+        return _iso_date(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def start_bulk_query(client: ShopifyClient, query: str) -> str:
+    """
+    Start een bulk query. Retourneert het BulkOperation id.
+    """
+    q = """
+    mutation($query: String!) {
+      bulkOperationRunQuery(query: $query) {
+        bulkOperation { id status }
+        userErrors { field message }
+      }
+    }
+    """
+    data = client.graphql(q, {"query": query})
+    result = data.get("bulkOperationRunQuery") or {}
+
+    errors = result.get("userErrors") or []
+    if errors:
+        raise RuntimeError(f"Bulk operation niet gestart: {errors}")
+
+    op = result.get("bulkOperation") or {}
+    if not op.get("id"):
+        raise RuntimeError("Bulk operation niet gestart: geen id ontvangen")
+    return op["id"]
+
+
+def poll_bulk_operation(
+    client: ShopifyClient,
+    operation_id: str,
+    interval: float = POLL_INTERVAL,
+    timeout: float = POLL_TIMEOUT,
+) -> Dict[str, Any]:
+    """
+    Wacht tot de bulk operatie klaar is. Retourneert de BulkOperation (met url).
+    """
+    q = """
+    query($id: ID!) {
+      node(id: $id) {
+        ... on BulkOperation { id status errorCode objectCount url partialDataUrl }
+      }
+    }
+    """
+    deadline = time.time() + timeout
+    while True:
+        op = (client.graphql(q, {"id": operation_id}) or {}).get("node") or {}
+        status = op.get("status")
+
+        if status == "COMPLETED":
+            return op
+        if status in {"FAILED", "CANCELED", "EXPIRED"}:
+            raise RuntimeError(f"Bulk operation {status}: {op.get('errorCode') or '-'}")
+        if time.time() > deadline:
+            raise TimeoutError(f"Bulk operation niet klaar binnen {timeout}s (status: {status})")
+
+        time.sleep(interval)
+
+
+def iter_jsonl(url: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream het resultaatbestand regel voor regel (zonder alles in te laden).
+    Let op: dit is een signed URL, dus zonder Shopify token headers.
+    """
+    with requests.get(url, stream=True, timeout=60) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def _amount(money_set: Optional[Dict[str, Any]]) -> Optional[str]:
+    shop_money = (money_set or {}).get("shopMoney") or {}
+    return shop_money.get("amount")
+
+
+def _order_from_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bulk (GraphQL) order omzetten naar dezelfde vorm als de REST orders die de rest van de app gebruikt.
+    """
+    legacy_id = node.get("legacyResourceId") or (node.get("id") or "").rsplit("/", 1)[-1]
+    shipping = node.get("shippingLine") or {}
+
+    return {
+        "id": int(legacy_id) if str(legacy_id).isdigit() else legacy_id,
+        "name": node.get("name"),
+        "created_at": node.get("createdAt"),
+        "updated_at": node.get("updatedAt"),
+        "email": node.get("email"),
+        "currency": node.get("currencyCode"),
+        "financial_status": (node.get("displayFinancialStatus") or "").lower() or None,
+        "fulfillment_status": (node.get("displayFulfillmentStatus") or "").lower() or None,
+        "subtotal_price": _amount(node.get("subtotalPriceSet")),
+        "total_price": _amount(node.get("totalPriceSet")),
+        "total_tax": _amount(node.get("totalTaxSet")),
+        "shipping_lines": [{"title": shipping.get("title")}] if shipping.get("title") else [],
+        "line_items": [],
+    }
+
+
+def _line_item_from_node(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "title": node.get("title"),
+        "sku": node.get("sku"),
+        "quantity": node.get("quantity"),
+        "price": _amount(node.get("originalUnitPriceSet")),
+    }
+
+
+class OrphanedLineItemsError(RuntimeError):
+    """
+    Er kwamen lineItems binnen waarvan de order al weggeschreven was (of nooit kwam).
+    """
+
+    def __init__(self, orphans: int, parents: List[str]):
+        self.orphans = orphans
+        self.parents = parents
+        super().__init__(
+            f"{orphans} lineItem(s) konden niet aan hun order gekoppeld worden "
+            f"(orders: {', '.join(parents[:10])}{' ...' if len(parents) > 10 else ''})"
+        )
+
+
+def iter_bulk_orders(
+    records: Iterable[Dict[str, Any]],
+    stats: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Zet de platte JSONL regels (orders + lineItems met __parentId) om naar complete orders.
+
+    Normaal staan children direct na hun parent en wordt er maar 1 order tegelijk
+    vastgehouden. Children die niet bij de huidige order horen worden apart bewaard:
+    komt hun parent later alsnog, dan worden ze gekoppeld. Wat aan het eind overblijft
+    (parent al weggeschreven of nooit gezien) wordt geteld in stats["orphans"] /
+    stats["orphan_parents"].
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault("orphans", 0)
+    stats.setdefault("orphan_parents", [])
+
+    current: Optional[Dict[str, Any]] = None
+    current_gid = None
+    early_children: Dict[str, List[Dict[str, Any]]] = {}
+
+    def orphan(parent_gid: str, count: int = 1):
+        stats["orphans"] += count
+        if parent_gid not in stats["orphan_parents"]:
+            stats["orphan_parents"].append(parent_gid)
+
+    for rec in records:
+        parent = rec.get("__parentId")
+        if parent is None:
+            if current is not None:
+                yield current
+            current = _order_from_node(rec)
+            current_gid = rec.get("id")
+            for child in early_children.pop(current_gid, []):
+                current["line_items"].append(_line_item_from_node(child))
+            continue
+
+        if current is not None and parent == current_gid:
+            current["line_items"].append(_line_item_from_node(rec))
+        else:
+            early_children.setdefault(parent, []).append(rec)
+
+    if current is not None:
+        yield current
+
+    for parent, children in early_children.items():
+        orphan(parent, len(children))
+
+
+def _open_export(path: str):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def backfill_orders(
+    shop: str = "abc-led",
+    since: str = "",
+    until: str = "",
+    out_path: Optional[str] = None,
+    sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+    poll_interval: float = POLL_INTERVAL,
+) -> int:
+    """
+    Historische orders ophalen via een bulk operatie.
+    Elke order gaat naar out_path (JSONL, .gz mag) en/of naar sink(order).
+    Retourneert het aantal orders. Konden er lineItems niet aan een order gekoppeld
+    worden, dan volgt na het wegschrijven een OrphanedLineItemsError.
+    """
+    filters = []
+    if since:
+        filters.append(f"created_at:>={_iso_date(since)}")
+    if until:
+        filters.append(f"created_at:<{_iso_date(until)}")
+    query = ORDERS_BULK_QUERY % {"filter": " AND ".join(filters)}
+
+    client = ShopifyClient(shop_key=shop)
+    try:
+        operation_id = start_bulk_query(client, query)
+        op = poll_bulk_operation(client, operation_id, interval=poll_interval)
+    finally:
+        client.close()
+
+    # Geen resultaten: Shopify geeft dan geen url terug
+    url = op.get("url")
+    if not url:
+        return 0
+
+    out = _open_export(out_path) if out_path else None
+    count = 0
+    stats: Dict[str, Any] = {}
+    try:
+        for order in iter_bulk_orders(iter_jsonl(url), stats):
+            if out is not None:
+                out.write(json.dumps(order, separators=(",", ":")) + "\n")
+            if sink is not None:
+                sink(order)
+            count += 1
+    finally:
+        if out is not None:
+            out.close()
+
+    if stats["orphans"]:
+        raise OrphanedLineItemsError(stats["orphans"], stats["orphan_parents"])
+    return count
+
+
+def main(argv: Optional[list] = None) -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Backfill Shopify orders via Bulk Operations")
+    parser.add_argument("--shop", default="abc-led")
+    parser.add_argument("--since", type=_date_arg, default="", help="created_at vanaf (YYYY-MM-DD)")
+    parser.add_argument("--until", type=_date_arg, default="", help="created_at tot (YYYY-MM-DD)")
+    parser.add_argument("--out", required=True, help="export bestand (.jsonl of .jsonl.gz)")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    count = backfill_orders(
+        shop=args.shop,
+        since=args.since,
+        until=args.until,
+        out_path=args.out,
+        poll_interval=args.poll_interval,
+    )
+    print(f"Orders geexporteerd: {count} -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,344 @@
+"""
+Gedeelde cache voor alle uvicorn workers.
+
+Elke worker heeft zijn eigen geheugen, dus een dict-cache zou per worker
+opnieuw naar Shopify gaan. Deze cache staat in één SQLite bestand (WAL mode),
+zodat alle workers dezelfde order snapshots, klanten en pick-namen lezen.
+
+- Entries zijn versioned: elke set() verhoogt de versie van die key.
+- Een lock-tabel zorgt dat precies één worker een shop ververst; de andere
+  workers wachten kort op de nieuwe versie en lezen daarna het gedeelde resultaat.
+
+Config (env):
+    ABC_CACHE_PATH  pad naar het SQLite bestand (default: .cache/abc-dashboard.sqlite3)
+    ABC_CACHE_TTL         seconden dat een order snapshot vers is (default: 60, 0 = uit)
+    ABC_CACHE_LOOKUP_TTL  seconden dat klanten / pick-namen geldig zijn (default: 900)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(".cache", "abc-dashboard.sqlite3")
+DEFAULT_TTL = 60
+DEFAULT_LOOKUP_TTL = 15 * 60
+
+# Hoe lang een refresh-lock maximaal geldig is (crash van een worker mag niet alles blokkeren)
+LOCK_TTL = 60
+# Hoe vaak wachtende workers opnieuw kijken of er een nieuwe versie is
+POLL_INTERVAL = 0.1
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def cache_path() -> str:
+    return os.getenv("ABC_CACHE_PATH", "").strip() or DEFAULT_PATH
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open een connectie op het gedeelde cache-bestand (WAL, zodat lezers niet op schrijvers wachten).
+    """
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SharedCache:
+    """
+    Versioned key/value cache in SQLite, gedeeld tussen processen.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: int = DEFAULT_TTL, lookup_ttl: int = DEFAULT_LOOKUP_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lookup_ttl = lookup_ttl
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._init_schema()
+
+    # -------------------------
+    # Connectie / schema
+    # -------------------------
+
+    def _conn(self) -> sqlite3.Connection:
+        # 1 connectie per thread (FastAPI draait sync routes in een threadpool)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace  TEXT NOT NULL,
+                key        TEXT NOT NULL,
+                version    INTEGER NOT NULL,
+                value      TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_locks (
+                name       TEXT PRIMARY KEY,
+                owner      TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    # -------------------------
+    # Entries
+    # -------------------------
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[int, Any, float]]:
+        """
+        Retourneert (version, value, updated_at) of None.
+        """
+        row = self._conn().execute(
+            "SELECT version, value, updated_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if not row:
+            return None
+        version, value, updated_at = row
+        return int(version), json.loads(value), float(updated_at)
+
+    def set(self, namespace: str, key: str, value: Any) -> int:
+        """
+        Schrijf een waarde en verhoog de versie. Retourneert de nieuwe versie.
+        """
+        conn = self._conn()
+        payload = json.dumps(value, separators=(",", ":"))
+        conn.execute(
+            """
+            INSERT INTO cache_entries (namespace, key, version, value, updated_at)
+            VALUES (?, ?, 1, ?, ?)
+            ON CONFLICT(namespace, key) DO UPDATE SET
+                version = version + 1,
+                value = excluded.value,
+                updated_at = excluded.updated_at
+            """,
+            (namespace, key, payload, time.time()),
+        )
+        row = conn.execute(
+            "SELECT version FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    def get_fresh(self, namespace: str, key: str, ttl: Optional[int] = None) -> Optional[Any]:
+        """
+        Alleen de waarde als die jonger is dan ttl (default: lookup_ttl), anders None.
+        """
+        ttl = self.lookup_ttl if ttl is None else ttl
+        current = self.get(namespace, key)
+        if not current or time.time() - current[2] >= ttl:
+            return None
+        return current[1]
+
+    def prune(self, namespace: str, max_age: int):
+        """
+        Verwijder entries die ouder zijn dan max_age seconden (houdt het bestand klein).
+        """
+        self._conn().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND updated_at < ?",
+            (namespace, time.time() - max_age),
+        )
+
+    def delete_many(self, namespace: str, keys: list[str]):
+        if not keys:
+            return
+        conn = self._conn()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" for _ in chunk)
+            conn.execute(
+                f"DELETE FROM cache_entries WHERE namespace = ? AND key IN ({marks})",
+                (namespace, *chunk),
+            )
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, Any]:
+        if not keys:
+            return {}
+        out: dict[str, Any] = {}
+        conn = self._conn()
+        # SQLite heeft een limiet op het aantal parameters; in stukken opvragen
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" for _ in chunk)
+            rows = conn.execute(
+                f"SELECT key, value FROM cache_entries WHERE namespace = ? AND key IN ({marks})",
+                (namespace, *chunk),
+            ).fetchall()
+            for k, v in rows:
+                out[k] = json.loads(v)
+        return out
+
+    def set_many(self, namespace: str, items: dict[str, Any]):
+        if not items:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO cache_entries (namespace, key, version, value, updated_at)
+                VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT(namespace, key) DO UPDATE SET
+                    version = version + 1,
+                    value = excluded.value,
+                    updated_at = excluded.updated_at
+                """,
+                [(namespace, k, json.dumps(v, separators=(",", ":")), now) for k, v in items.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # -------------------------
+    # Cross-process lock
+    # -------------------------
+
+    def _lock_owner(self) -> str:
+        # Per proces én per thread uniek, anders zou een tweede thread van dezelfde worker ook "winnen"
+        return f"{self.owner}-{threading.get_ident()}"
+
+    def try_lock(self, name: str) -> bool:
+        """
+        Probeer de lock te pakken (niet blokkerend). Verlopen locks worden overgenomen.
+        """
+        conn = self._conn()
+        owner = self._lock_owner()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT owner, expires_at FROM cache_locks WHERE name = ?", (name,)
+            ).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_locks (name, owner, expires_at) VALUES (?, ?, ?)",
+                (name, owner, now + LOCK_TTL),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def unlock(self, name: str):
+        self._conn().execute(
+            "DELETE FROM cache_locks WHERE name = ? AND owner = ?", (name, self._lock_owner())
+        )
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[bool]:
+        """
+        with cache.lock("refresh:abc-led") as acquired: ...
+        """
+        acquired = self.try_lock(name)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self.unlock(name)
+
+    # -------------------------
+    # Refresh (1 worker haalt op, de rest leest mee)
+    # -------------------------
+
+    def get_or_refresh(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Any],
+        ttl: Optional[int] = None,
+        force: bool = False,
+    ) -> Any:
+        """
+        Geef de gedeelde waarde terug. Is die verlopen (of force=True), dan ververst
+        precies één worker via loader(); andere workers wachten op de nieuwe versie.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        current = self.get(namespace, key)
+
+        if current and not force and time.time() - current[2] < ttl:
+            return current[1]
+
+        seen_version = current[0] if current else 0
+        lock_name = f"{namespace}:{key}"
+
+        deadline = time.time() + LOCK_TTL
+        while True:
+            with self.lock(lock_name) as acquired:
+                if acquired:
+                    # Misschien heeft een andere worker net ververst terwijl wij wachtten
+                    latest = self.get(namespace, key)
+                    if latest and latest[0] > seen_version:
+                        return latest[1]
+
+                    value = loader()
+                    self.set(namespace, key, value)
+                    return value
+
+            time.sleep(POLL_INTERVAL)
+
+            latest = self.get(namespace, key)
+            if latest and latest[0] > seen_version:
+                return latest[1]
+
+            if time.time() > deadline:
+                # Lock-houder lijkt vast te zitten: liever oude data dan niks
+                if current:
+                    return current[1]
+                return loader()
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[SharedCache]:
+    """
+    Gedeelde cache instance voor dit proces (None als ABC_CACHE_TTL=0).
+    """
+    global _cache
+    ttl = _env_int("ABC_CACHE_TTL", DEFAULT_TTL)
+    if ttl <= 0:
+        return None
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SharedCache(
+                    path=cache_path(),
+                    ttl=ttl,
+                    lookup_ttl=_env_int("ABC_CACHE_LOOKUP_TTL", DEFAULT_LOOKUP_TTL),
+                )
+    return _cache
@@ -0,0 +1,255 @@
+"""
+Picklijst snapshots ("wat is er al geprint?").
+
+Bij het tonen van een picklijst bewaren we precies de getoonde pick rows
+gecomprimeerd (zlib + JSON) met een ID, plus per order een content-hash. Pas als
+die lijst echt geprint wordt, telt de snapshot mee. Een volgende picklijst kan dan tegen zo'n
+snapshot gediffed worden: alleen orders waarvan de hash nieuw of anders is
+hoeven opnieuw getoond/geprint te worden. Vergelijken gaat puur op hashes,
+dus de oude rows worden daarvoor niet uitgepakt.
+
+Snapshots staan in hetzelfde SQLite bestand als de gedeelde cache (ABC_CACHE_PATH).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from app.services.cache import cache_path, connect
+
+# Hoeveel geprinte snapshots per shop we bewaren
+KEEP_PER_SHOP = 50
+# Getoonde maar (nog) niet geprinte snapshots worden na zoveel seconden opgeruimd
+PENDING_MAX_AGE = 60 * 60
+
+# Velden die alleen voor weergave zijn en niets zeggen over de inhoud van een order
+_VOLATILE_FIELDS = {"is_first_in_order", "is_changed"}
+
+
+def _row_order_key(row: Dict[str, Any]) -> str:
+    return str(row.get("order_number") or "-")
+
+
+def group_rows_by_order(rows: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        grouped.setdefault(_row_order_key(r), []).append(r)
+    return grouped
+
+
+def order_hash(order_rows: List[Dict[str, Any]]) -> str:
+    clean = [{k: v for k, v in r.items() if k not in _VOLATILE_FIELDS} for r in order_rows]
+    payload = json.dumps(clean, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def order_hashes(rows: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    { order_number: hash } voor alle orders in de rows.
+    """
+    return {key: order_hash(order_rows) for key, order_rows in group_rows_by_order(rows).items()}
+
+
+def diff_rows(
+    rows: List[Dict[str, Any]],
+    previous_hashes: Dict[str, str],
+    hashes: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Vergelijk de huidige rows met de hashes van een eerdere snapshot.
+    hashes = order_hashes(rows) als die al berekend zijn (scheelt een tweede keer hashen).
+    Retourneert alleen de rows van nieuwe en gewijzigde orders (in de originele volgorde).
+    """
+    current = hashes if hashes is not None else order_hashes(rows)
+
+    added: List[str] = []
+    changed: List[str] = []
+    for key, current_hash in current.items():
+        old = previous_hashes.get(key)
+        if old is None:
+            added.append(key)
+        elif old != current_hash:
+            changed.append(key)
+
+    removed = [key for key in previous_hashes if key not in current]
+
+    changed_set = set(changed)
+    keep = set(added) | changed_set
+    delta_rows = []
+    for r in rows:
+        key = _row_order_key(r)
+        if key in keep:
+            delta_rows.append({**r, "is_changed": key in changed_set})
+
+    return {
+        "rows": delta_rows,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+    }
+
+
+class PicklistSnapshotStore:
+    """
+    Opslag van geprinte picklijsten in SQLite.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS picklist_snapshots (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                shop       TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                row_count  INTEGER NOT NULL,
+                hashes     BLOB NOT NULL,
+                rows       BLOB NOT NULL,
+                printed    INTEGER NOT NULL DEFAULT 1
+            )
+            """
+        )
+        columns = {r[1] for r in self._conn().execute("PRAGMA table_info(picklist_snapshots)")}
+        if "printed" not in columns:
+            self._conn().execute(
+                "ALTER TABLE picklist_snapshots ADD COLUMN printed INTEGER NOT NULL DEFAULT 1"
+            )
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS idx_picklist_snapshots_shop ON picklist_snapshots (shop, id)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _pack(value: Any) -> bytes:
+        return zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+    @staticmethod
+    def _unpack(blob: bytes) -> Any:
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def save(
+        self,
+        shop: str,
+        rows: List[Dict[str, Any]],
+        printed: bool = True,
+        hashes: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """
+        Bewaar rows als snapshot. Met printed=False telt hij pas mee (latest/list/since)
+        nadat mark_printed() is aangeroepen. Is de inhoud gelijk aan de laatst bewaarde
+        snapshot (geprint of niet), dan wordt niets geschreven en dat id teruggegeven.
+        """
+        if hashes is None:
+            hashes = order_hashes(rows)
+
+        conn = self._conn()
+        now = time.time()
+
+        if not printed:
+            last = conn.execute(
+                "SELECT id, row_count, hashes, printed FROM picklist_snapshots WHERE shop = ? ORDER BY id DESC LIMIT 1",
+                (shop,),
+            ).fetchone()
+            if last and last[1] == len(rows) and self._unpack(last[2]) == hashes:
+                if not last[3]:
+                    # Nog niet geprint: weer "vers", zodat hij niet onder de open pagina wordt opgeruimd
+                    conn.execute("UPDATE picklist_snapshots SET created_at = ? WHERE id = ?", (now, last[0]))
+                return int(last[0])
+
+        cur = conn.execute(
+            "INSERT INTO picklist_snapshots (shop, created_at, row_count, hashes, rows, printed) VALUES (?, ?, ?, ?, ?, ?)",
+            (shop, now, len(rows), self._pack(hashes), self._pack(rows), int(printed)),
+        )
+        snapshot_id = int(cur.lastrowid)
+
+        # Oude snapshots opruimen
+        conn.execute(
+            "DELETE FROM picklist_snapshots WHERE shop = ? AND printed = 0 AND created_at < ?",
+            (shop, now - PENDING_MAX_AGE),
+        )
+        conn.execute(
+            """
+            DELETE FROM picklist_snapshots
+            WHERE shop = ? AND printed = 1 AND id NOT IN (
+                SELECT id FROM picklist_snapshots WHERE shop = ? AND printed = 1 ORDER BY created_at DESC, id DESC LIMIT ?
+            )
+            """,
+            (shop, shop, KEEP_PER_SHOP),
+        )
+        return snapshot_id
+
+    def mark_printed(self, shop: str, snapshot_id: int) -> bool:
+        """
+        Markeer een getoonde snapshot als geprint (tijdstip = nu).
+        """
+        cur = self._conn().execute(
+            "UPDATE picklist_snapshots SET printed = 1, created_at = ? WHERE shop = ? AND id = ?",
+            (time.time(), shop, int(snapshot_id)),
+        )
+        return cur.rowcount > 0
+
+    def latest(self, shop: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT id, created_at, row_count, hashes FROM picklist_snapshots WHERE shop = ? AND printed = 1 ORDER BY created_at DESC, id DESC LIMIT 1",
+            (shop,),
+        ).fetchone()
+        return self._meta(row)
+
+    def get(self, shop: str, snapshot_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT id, created_at, row_count, hashes FROM picklist_snapshots WHERE shop = ? AND id = ? AND printed = 1",
+            (shop, int(snapshot_id)),
+        ).fetchone()
+        return self._meta(row)
+
+    def list(self, shop: str, limit: int = 10) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT id, created_at, row_count FROM picklist_snapshots WHERE shop = ? AND printed = 1 ORDER BY created_at DESC, id DESC LIMIT ?",
+            (shop, limit),
+        ).fetchall()
+        return [{"id": r[0], "created_at": r[1], "row_count": r[2]} for r in rows]
+
+    def load_rows(self, shop: str, snapshot_id: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        De volledige (uitgepakte) rows van een snapshot, bv. om een oude print te herhalen.
+        """
+        row = self._conn().execute(
+            "SELECT rows FROM picklist_snapshots WHERE shop = ? AND id = ? AND printed = 1",
+            (shop, int(snapshot_id)),
+        ).fetchone()
+        return self._unpack(row[0]) if row else None
+
+    def _meta(self, row) -> Optional[Dict[str, Any]]:
+        if not row:
+            return None
+        snapshot_id, created_at, row_count, hashes = row
+        return {
+            "id": snapshot_id,
+            "created_at": created_at,
+            "row_count": row_count,
+            "hashes": self._unpack(hashes),
+        }
+
+
+_store: Optional[PicklistSnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> PicklistSnapshotStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PicklistSnapshotStore(cache_path())
+    return _store
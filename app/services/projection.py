@@ -0,0 +1,291 @@
+"""
+Order projectie: een ruwe Shopify order 1x omzetten naar een genormaliseerd record.
+
+Klantnaam, verzendlabels en bedragen werden per view (orders, picklijsten,
+order detail) apart en steeds opnieuw bepaald. project_order() doet dat op één
+plek en onthoudt het resultaat per order versie (id + updated_at + de velden
+waar de klantnaam uit komt) in een LRU.
+
+Let op: het record wordt gedeeld tussen requests, dus niet aanpassen.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_SIZE = 2048
+
+PICKUP_LABEL = "Afhalen / Pickup"
+
+
+def _money_to_float(v: Any) -> float:
+    try:
+        return float(str(v))
+    except Exception:
+        return 0.0
+
+
+def _norm_str(v: Any) -> str:
+    """Maak string vergelijkingen betrouwbaar (None/ints/spaties)."""
+    if v is None:
+        return ""
+    return str(v).strip()
+
+
+def _full_name_from_address(addr: Dict[str, Any]) -> str:
+    """
+    Shopify address object heeft vaak 'name' gevuld (volledige naam).
+    Fallback naar first/last en daarna company.
+    """
+    name = _norm_str(addr.get("name"))
+    if name:
+        return name
+
+    first = _norm_str(addr.get("first_name"))
+    last = _norm_str(addr.get("last_name"))
+    full = f"{first} {last}".strip()
+    if full:
+        return full
+
+    company = _norm_str(addr.get("company"))
+    if company:
+        return company
+
+    return ""
+
+
+def _customer_name(order: Dict[str, Any]) -> str:
+    """
+    Klantnaam bepalen.
+    0) Eerst Flow-metafield (custom.pick_klantnaam) dat we in shopify.py als order["pick_klantnaam"] zetten.
+    Daarna: shipping/billing/customer/email fallbacks.
+    """
+
+    # 0) Flow metafield (werkt ook als PII via API redacted is)
+    mf_name = _norm_str(order.get("pick_klantnaam"))
+    if mf_name:
+        return mf_name
+
+    # 1) shipping_address (meest relevant voor picken)
+    ship = order.get("shipping_address") or {}
+    ship_name = _full_name_from_address(ship)
+    if ship_name:
+        return ship_name
+
+    # 2) billing_address (soms wél gevuld)
+    bill = order.get("billing_address") or {}
+    bill_name = _full_name_from_address(bill)
+    if bill_name:
+        return bill_name
+
+    # 3) customer object
+    cust = order.get("customer") or {}
+
+    cust_name = _norm_str(cust.get("name"))
+    if cust_name:
+        return cust_name
+
+    first = _norm_str(cust.get("first_name"))
+    last = _norm_str(cust.get("last_name"))
+    full = f"{first} {last}".strip()
+    if full:
+        return full
+
+    default_addr = cust.get("default_address") or {}
+    default_name = _full_name_from_address(default_addr)
+    if default_name:
+        return default_name
+
+    # 4) laatste redmiddel: email (beter dan '-')
+    email = _norm_str(order.get("email") or order.get("contact_email") or cust.get("email"))
+    if email:
+        return email
+
+    return "-"
+
+
+def _account_name(order: Dict[str, Any]) -> str:
+    """
+    Klantnaam voor de orderlijst en order detail: het klantaccount gaat vóór het
+    verzendadres, zodat B2B orders op bedrijfsnaam (default_address.company) staan.
+    """
+    mf_name = _norm_str(order.get("pick_klantnaam"))
+    if mf_name:
+        return mf_name
+
+    # 1) Shopify customer first/last
+    cust = order.get("customer") or {}
+    full = f"{_norm_str(cust.get('first_name'))} {_norm_str(cust.get('last_name'))}".strip()
+    if full:
+        return full
+
+    # 2) B2B / zakelijke klant: company uit default_address
+    company = _norm_str((cust.get("default_address") or {}).get("company"))
+    if company:
+        return company
+
+    # 3) shipping / billing address
+    for addr in (order.get("shipping_address") or {}, order.get("billing_address") or {}):
+        name = _norm_str(addr.get("name"))
+        if name:
+            return name
+        full = f"{_norm_str(addr.get('first_name'))} {_norm_str(addr.get('last_name'))}".strip()
+        if full:
+            return full
+
+    # 4) order-level email (staat vaak op order, ook bij guest checkout)
+    email = _norm_str(order.get("email") or order.get("contact_email"))
+    if email:
+        return email
+
+    return "-"
+
+
+def _shipping_titles(order: Dict[str, Any]) -> List[str]:
+    lines = order.get("shipping_lines") or []
+    if not isinstance(lines, list):
+        return []
+    titles = [_norm_str(l.get("title")) for l in lines]
+    return [t for t in titles if t]
+
+
+def _order_subtotal(order: Dict[str, Any]) -> float:
+    # Picklijst: actuele subtotaal (na wijzigingen), anders subtotal/total
+    if order.get("current_subtotal_price") is not None:
+        return _money_to_float(order.get("current_subtotal_price"))
+    if order.get("subtotal_price") is not None:
+        return _money_to_float(order.get("subtotal_price"))
+    return _money_to_float(order.get("total_price"))
+
+
+def _line_items(order: Dict[str, Any]) -> List[Dict[str, Any]]:
+    items = []
+    for item in (order.get("line_items") or []):
+        mpn = _norm_str(item.get("mpn")) or _norm_str(item.get("sku")) or "-"
+        items.append(
+            {
+                "product_name": _norm_str(item.get("title") or "-"),
+                "mpn": mpn,
+                "qty": int(item.get("quantity") or 0),
+                "unit_price": _money_to_float(item.get("price")),
+            }
+        )
+    return items
+
+
+def _money(order: Dict[str, Any], line_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    subtotal = _money_to_float(order.get("subtotal_price"))
+    # Als subtotal ontbreekt, bereken uit regels
+    if subtotal == 0.0:
+        subtotal = sum(li["unit_price"] * li["qty"] for li in line_items)
+
+    return {
+        "currency": order.get("currency") or "EUR",
+        "subtotal": subtotal,
+        "shipping": sum(_money_to_float(sl.get("price")) for sl in (order.get("shipping_lines") or [])),
+        "discounts": _money_to_float(order.get("total_discounts")),
+        "tax": _money_to_float(order.get("total_tax")),
+        "total": _money_to_float(order.get("total_price")),
+    }
+
+
+def _status_label(v: Any, default: str) -> str:
+    return (v or default).replace("_", " ").title()
+
+
+def _project(order: Dict[str, Any]) -> Dict[str, Any]:
+    titles = _shipping_titles(order)
+    line_items = _line_items(order)
+
+    return {
+        "id": order.get("id"),
+        "name": order.get("name"),
+        "order_number": _norm_str(order.get("name") or order.get("order_number") or "-"),
+        "created_at": order.get("created_at"),
+        "updated_at": order.get("updated_at"),
+        "total_price": order.get("total_price"),
+        "currency": order.get("currency"),
+        # Picklijst: naam op het pakket; orderlijst/detail: naam van het klantaccount
+        "customer_name": _customer_name(order),
+        "account_name": _account_name(order),
+        # Picklijst: eerste verzendregel; orderlijst/detail: alle titels samen
+        "shipping_method": titles[0] if titles else "-",
+        "shipping_label": ", ".join(titles) if titles else PICKUP_LABEL,
+        "order_subtotal": _order_subtotal(order),
+        "money": _money(order, line_items),
+        "financial_status": _status_label(order.get("financial_status"), "-"),
+        "fulfillment_status": _status_label(order.get("fulfillment_status"), "unfulfilled"),
+        "line_items": line_items,
+    }
+
+
+_cache: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+_ADDRESS_NAME_FIELDS = ("name", "first_name", "last_name", "company")
+
+
+def _address_names(addr: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+    addr = addr or {}
+    return tuple(addr.get(f) for f in _ADDRESS_NAME_FIELDS)
+
+
+def _name_inputs(order: Dict[str, Any]) -> Tuple[Any, ...]:
+    """
+    Alle velden waar _customer_name/_account_name naar kijken. Die worden deels ná
+    Shopify's updated_at ingevuld (pick_klantnaam, opgehaalde klant in _load_orders),
+    dus ze moeten zelf in de versie zitten.
+    """
+    cust = order.get("customer") or {}
+    return (
+        order.get("pick_klantnaam"),
+        order.get("email"),
+        order.get("contact_email"),
+        cust.get("name"),
+        cust.get("first_name"),
+        cust.get("last_name"),
+        cust.get("email"),
+        _address_names(cust.get("default_address")),
+        _address_names(order.get("shipping_address")),
+        _address_names(order.get("billing_address")),
+    )
+
+
+def order_version(order: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Versie van een order (id + updated_at + naamvelden), of None als die onbekend is.
+    Handig om te zien of een order sinds de vorige keer veranderd is zonder te hashen.
+    """
+    oid = order.get("id")
+    updated_at = order.get("updated_at")
+    if not oid or not updated_at:
+        return None
+
+    return (oid, updated_at, _name_inputs(order))
+
+
+def project_order(order: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Genormaliseerd record voor een Shopify order (gememoiseerd per order versie).
+    """
+    key = order_version(order)
+    if key is None:
+        return _project(order)
+
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+
+    projected = _project(order)
+
+    with _cache_lock:
+        _cache[key] = projected
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return projected
+
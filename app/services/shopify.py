@@ -1,6 +1,8 @@
 import os
 import requests
 
+from app.services.cache import get_cache
+
 
 class ShopifyClient:
     """
@@ -55,7 +57,13 @@ class ShopifyClient:
                 "Accept": "application/json",
             }
         )
-        self.base_url = f"https://{self.shop}/admin/api/{self.version}"
+        # Optioneel: andere host (bv. lokale fake Shopify server voor offline testen)
+        base = (
+            os.getenv(f"{prefix}_SHOPIFY_BASE_URL")
+            or os.getenv("SHOPIFY_BASE_URL")
+            or f"https://{self.shop}"
+        ).rstrip("/")
+        self.base_url = f"{base}/admin/api/{self.version}"
 
     def close(self):
         try:
@@ -111,7 +119,7 @@ class ShopifyClient:
         """
         Shopify GraphQL Admin API call.
         """
-        url = f"https://{self.shop}/admin/api/{self.version}/graphql.json"
+        url = f"{self.base_url}/graphql.json"
         payload = {"query": query, "variables": variables or {}}
         r = self.session.post(url, json=payload, timeout=30)
         r.raise_for_status()
@@ -164,7 +172,25 @@ def fetch_order_pick_names(client: ShopifyClient, order_ids: list[int]) -> dict[
     return out
 
 
-def fetch_orders(shop: str = "abc-led", limit: int = 50):
+def fetch_orders(shop: str = "abc-led", limit: int = 50, force: bool = False):
+    """
+    Orders voor de views. Met de gedeelde cache haalt maar 1 worker per shop de
+    snapshot op bij Shopify; de andere workers lezen hetzelfde resultaat.
+    force=True (knop "Orders ophalen") ververst altijd.
+    """
+    cache = get_cache()
+    if cache is None:
+        return _load_orders(shop=shop, limit=limit)
+
+    return cache.get_or_refresh(
+        "orders",
+        f"{shop}:{limit}",
+        lambda: _load_orders(shop=shop, limit=limit, cache=cache),
+        force=force,
+    )
+
+
+def _load_orders(shop: str = "abc-led", limit: int = 50, cache=None):
     client = ShopifyClient(shop_key=shop)
     try:
         orders = client.list_orders(limit=limit)
@@ -173,14 +199,26 @@ def fetch_orders(shop: str = "abc-led", limit: int = 50):
         order_ids = [int(o["id"]) for o in orders if o.get("id")]
         try:
             pick_names = fetch_order_pick_names(client, order_ids)
+            pick_names_ok = True
         except Exception:
             pick_names = {}
+            pick_names_ok = False
 
         for o in orders:
             oid = o.get("id")
             if oid in pick_names:
                 o["pick_klantnaam"] = pick_names[oid]
 
+        # Pick-namen ook los delen, zodat de order detail pagina geen extra GraphQL call nodig heeft
+        if cache is not None:
+            cache.set_many("pick_name", {f"{shop}:{oid}": name for oid, name in pick_names.items()})
+            # Metafield leeggemaakt: oude naam niet meer tonen (alleen als de lookup gelukt is)
+            if pick_names_ok:
+                cache.delete_many("pick_name", [f"{shop}:{oid}" for oid in order_ids if oid not in pick_names])
+            # Verlopen klanten / pick-namen opruimen (1x per refresh, niet per request)
+            cache.prune("pick_name", cache.lookup_ttl)
+            cache.prune("customer", cache.lookup_ttl)
+
         # 2) (optioneel) customer fallback (blijft zoals je had)
         customer_cache = {}
 
@@ -216,11 +254,21 @@ def fetch_orders(shop: str = "abc-led", limit: int = 50):
                 o["customer"] = customer_cache[cust_id]
                 continue
 
+            # Gedeelde cache: klant is misschien al door een andere worker opgehaald
+            if cache is not None:
+                shared = cache.get_fresh("customer", f"{shop}:{cust_id}")
+                if shared:
+                    customer_cache[cust_id] = shared
+                    o["customer"] = shared
+                    continue
+
             try:
                 full_customer = client.get_customer(int(cust_id))
                 if full_customer:
                     customer_cache[cust_id] = full_customer
                     o["customer"] = full_customer
+                    if cache is not None:
+                        cache.set("customer", f"{shop}:{cust_id}", full_customer)
             except Exception:
                 pass
 
@@ -256,8 +304,18 @@ def get_order_pick_name(shop: str = "abc-led", order_id: int = 0) -> str | None:
     if not order_id:
         return None
 
+    cache = get_cache()
+    if cache is not None:
+        shared = cache.get_fresh("pick_name", f"{shop}:{int(order_id)}")
+        if shared:
+            return shared
+
     client = ShopifyClient(shop_key=shop)
     try:
-        return fetch_order_pick_name(client, int(order_id))
+        name = fetch_order_pick_name(client, int(order_id))
     finally:
         client.close()
+
+    if cache is not None and name:
+        cache.set("pick_name", f"{shop}:{int(order_id)}", name)
+    return name
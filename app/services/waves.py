@@ -0,0 +1,168 @@
+"""
+Wave picking: alle open orders gegroepeerd per MPN/SKU.
+
+Een picker loopt zo 1x naar een schap en pakt het totaal, met per order hoeveel
+er in welk bakje moet. De index wordt incrementeel bijgehouden: bij elke sync()
+worden alleen orders die erbij komen, verdwijnen of een andere versie hebben
+verwerkt; de rest blijft staan. De versie is id + updated_at plus de velden die
+de wave zelf toont (klantnaam, verzendmethode), zodat een later verrijkte klant
+ook zonder nieuwe updated_at wordt bijgewerkt.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.picking import shipping_display
+from app.services.projection import project_order
+
+
+def _wave_key(item: Dict[str, Any]) -> str:
+    mpn = str(item.get("mpn") or "-")
+    if mpn != "-":
+        return mpn
+    # Zonder MPN/SKU niet alles op 1 hoop gooien
+    return f"-:{item.get('product_name') or '-'}"
+
+
+def _order_key(order: Dict[str, Any]) -> str:
+    return str(order.get("id") or order.get("name") or order.get("order_number") or "-")
+
+
+def _wave_version(p: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """
+    Versie van een geprojecteerde order voor de wave index (None = onbekend, altijd verwerken).
+    """
+    if not p["id"] or not p["updated_at"]:
+        return None
+    return (p["id"], p["updated_at"], p["customer_name"], p["shipping_method"])
+
+
+class WaveIndex:
+    """
+    Per MPN: totaal aantal + verdeling per order.
+    """
+
+    def __init__(self):
+        # order key -> (versie, [wave_key, ...])
+        self._orders: Dict[str, Tuple[Optional[Tuple[Any, ...]], List[str]]] = {}
+        # wave_key -> {"total_qty": int, "orders": {order key: entry}}
+        self._waves: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _add_order(self, key: str, version: Optional[Tuple[Any, ...]], p: Dict[str, Any]):
+        shipping_method, is_pickup = shipping_display(p["shipping_method"])
+
+        wave_keys: List[str] = []
+        for item in p["line_items"]:
+            wkey = _wave_key(item)
+            qty = item["qty"]
+
+            wave = self._waves.setdefault(wkey, {"total_qty": 0, "orders": {}})
+            wave["total_qty"] += qty
+
+            entry = wave["orders"].get(key)
+            if entry is None:
+                # mpn/product_name per order bewaren, zodat het label klopt als orders vertrekken
+                wave["orders"][key] = {
+                    "order_number": p["order_number"],
+                    "customer_name": p["customer_name"],
+                    "shipping_method": shipping_method,
+                    "is_pickup": is_pickup,
+                    "mpn": item["mpn"],
+                    "product_name": item["product_name"],
+                    "qty": qty,
+                }
+                wave_keys.append(wkey)
+            else:
+                # Zelfde MPN meerdere keren in 1 order
+                entry["qty"] += qty
+
+        self._orders[key] = (version, wave_keys)
+
+    def _remove_order(self, key: str):
+        _, wave_keys = self._orders.pop(key, (None, []))
+        for wkey in wave_keys:
+            wave = self._waves.get(wkey)
+            if wave is None:
+                continue
+            entry = wave["orders"].pop(key, None)
+            if entry is not None:
+                wave["total_qty"] -= entry["qty"]
+            if not wave["orders"]:
+                del self._waves[wkey]
+
+    def sync(self, orders: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Breng de index in lijn met de huidige orders.
+        Orders zonder bekende versie (geen id/updated_at) worden altijd opnieuw verwerkt.
+        Retourneert hoeveel orders er zijn toegevoegd / verwijderd / bijgewerkt.
+        """
+        current = {_order_key(o): o for o in orders}
+        stats = {"added": 0, "removed": 0, "updated": 0}
+
+        with self._lock:
+            for key in [k for k in self._orders if k not in current]:
+                self._remove_order(key)
+                stats["removed"] += 1
+
+            for key, order in current.items():
+                # Projectie is gememoiseerd, dus dit is voor ongewijzigde orders een cache hit
+                p = project_order(order)
+                version = _wave_version(p)
+                known = self._orders.get(key)
+                if known and version is not None and known[0] == version:
+                    continue
+
+                if known:
+                    self._remove_order(key)
+                    stats["updated"] += 1
+                else:
+                    stats["added"] += 1
+                self._add_order(key, version, p)
+
+        return stats
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """
+        Wave regels gesorteerd op MPN, met de orderverdeling als lijst.
+        """
+        with self._lock:
+            out = []
+            for wave in self._waves.values():
+                orders = sorted(wave["orders"].values(), key=lambda e: e["order_number"])
+                # Label van de orders die er nu nog in zitten
+                label = orders[0]
+                out.append(
+                    {
+                        "mpn": label["mpn"],
+                        "product_name": label["product_name"],
+                        "total_qty": wave["total_qty"],
+                        "order_count": len(orders),
+                        "orders": [dict(e) for e in orders],
+                    }
+                )
+
+        out.sort(key=lambda w: (str(w["mpn"]), str(w["product_name"])))
+        return out
+
+
+_indexes: Dict[str, WaveIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_wave_index(shop: str) -> WaveIndex:
+    """
+    1 index per shop per worker; sync() houdt hem bij met de (gedeelde) order snapshot.
+    """
+    with _indexes_lock:
+        index = _indexes.get(shop)
+        if index is None:
+            index = WaveIndex()
+            _indexes[shop] = index
+        return index
+
+
+def build_wave_rows(shop: str, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    index = get_wave_index(shop)
+    index.sync(orders)
+    return index.rows()
@@ -0,0 +1,183 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services import bulk
+
+
+def _order(n):
+    return {
+        "id": f"gid://shopify/Order/{n}",
+        "legacyResourceId": str(n),
+        "name": f"#{n}",
+        "createdAt": "2026-02-01T10:00:00Z",
+        "updatedAt": "2026-02-01T10:05:00Z",
+        "currencyCode": "EUR",
+        "displayFinancialStatus": "PAID",
+        "totalPriceSet": {"shopMoney": {"amount": "12.50"}},
+        "shippingLine": {"title": "Pakket"},
+    }
+
+
+def _line_item(n, j):
+    return {
+        "id": f"gid://shopify/LineItem/{n}{j}",
+        "title": "Lamp",
+        "sku": f"L{j}",
+        "quantity": j + 1,
+        "originalUnitPriceSet": {"shopMoney": {"amount": "2.00"}},
+        "__parentId": f"gid://shopify/Order/{n}",
+    }
+
+
+def _records(orders=3, items=2):
+    out = []
+    for n in range(1, orders + 1):
+        out.append(_order(n))
+        out.extend(_line_item(n, j) for j in range(items))
+    return out
+
+
+# -------------------------
+# Pure functies
+# -------------------------
+
+def test_order_from_node_maps_to_rest_shape():
+    order = bulk._order_from_node(_order(7))
+
+    assert order["id"] == 7
+    assert order["name"] == "#7"
+    assert order["total_price"] == "12.50"
+    assert order["financial_status"] == "paid"
+    assert order["shipping_lines"] == [{"title": "Pakket"}]
+    assert order["line_items"] == []
+
+
+def test_iter_bulk_orders_stitches_children():
+    stats = {}
+    orders = list(bulk.iter_bulk_orders(_records(), stats))
+
+    assert [o["id"] for o in orders] == [1, 2, 3]
+    assert [li["sku"] for li in orders[1]["line_items"]] == ["L0", "L1"]
+    assert stats["orphans"] == 0
+
+
+def test_iter_bulk_orders_attaches_children_that_come_first():
+    records = [_line_item(1, 0), _order(1), _line_item(1, 1)]
+    orders = list(bulk.iter_bulk_orders(records))
+
+    assert [li["sku"] for li in orders[0]["line_items"]] == ["L0", "L1"]
+
+
+def test_iter_bulk_orders_counts_orphans():
+    records = _records(orders=2, items=1) + [_line_item(1, 5), _line_item(99, 0)]
+    stats = {}
+    orders = list(bulk.iter_bulk_orders(records, stats))
+
+    assert len(orders) == 2
+    assert stats["orphans"] == 2
+    assert stats["orphan_parents"] == ["gid://shopify/Order/1", "gid://shopify/Order/99"]
+
+
+@pytest.mark.parametrize("value", ["2026-13-01", "2026-01-01\" OR x", "gisteren", ""])
+def test_iso_date_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        bulk._iso_date(value)
+
+
+# -------------------------
+# Start -> poll -> stream -> stitch tegen een lokale fake Shopify
+# -------------------------
+
+class FakeShopify:
+    def __init__(self, records):
+        self.records = records
+        self.queries = []
+        self.polls = 0
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if "bulkOperationRunQuery" in body["query"]:
+                    fake.queries.append(body["variables"]["query"])
+                    data = {
+                        "bulkOperationRunQuery": {
+                            "bulkOperation": {"id": "gid://shopify/BulkOperation/1", "status": "CREATED"},
+                            "userErrors": [],
+                        }
+                    }
+                else:
+                    fake.polls += 1
+                    status = "COMPLETED" if fake.polls >= 2 else "RUNNING"
+                    data = {"node": {"id": "gid://shopify/BulkOperation/1", "status": status, "url": fake.url}}
+                self._send(json.dumps({"data": data}).encode("utf-8"))
+
+            def do_GET(self):
+                self._send("\n".join(json.dumps(r) for r in fake.records).encode("utf-8"))
+
+            def _send(self, payload):
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.url = f"{self.base_url}/bulk/result.jsonl"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def shopify_env(monkeypatch):
+    monkeypatch.setenv("SHOPIFY_SHOP", "test.myshopify.com")
+    monkeypatch.setenv("SHOPIFY_ACCESS_TOKEN", "shpat_test")
+
+
+def test_backfill_orders_end_to_end(shopify_env, monkeypatch, tmp_path):
+    with FakeShopify(_records(orders=3, items=2)) as fake:
+        monkeypatch.setenv("SHOPIFY_BASE_URL", fake.base_url)
+        out = tmp_path / "orders.jsonl.gz"
+        seen = []
+
+        count = bulk.backfill_orders(
+            since="2026-01-01", out_path=str(out), sink=seen.append, poll_interval=0
+        )
+
+    assert count == 3
+    assert fake.polls == 2
+    assert 'created_at:>=2026-01-01' in fake.queries[0]
+
+    with gzip.open(out, "rt", encoding="utf-8") as f:
+        exported = [json.loads(line) for line in f]
+    assert exported == seen
+    assert [len(o["line_items"]) for o in exported] == [2, 2, 2]
+
+
+def test_backfill_orders_raises_on_orphans(shopify_env, monkeypatch, tmp_path):
+    records = _records(orders=2, items=1) + [_line_item(1, 3)]
+    with FakeShopify(records) as fake:
+        monkeypatch.setenv("SHOPIFY_BASE_URL", fake.base_url)
+        with pytest.raises(bulk.OrphanedLineItemsError) as err:
+            bulk.backfill_orders(out_path=str(tmp_path / "orders.jsonl"), poll_interval=0)
+
+    assert err.value.orphans == 1
+
+
+def test_backfill_orders_rejects_bad_dates_before_calling_shopify(shopify_env):
+    with pytest.raises(ValueError):
+        bulk.backfill_orders(since='2026-01-01" OR status:any')
@@ -0,0 +1,33 @@
+from app.services.picklist_snapshots import PicklistSnapshotStore, diff_rows, order_hashes
+
+
+def _row(order, qty=1):
+    return {"order_number": order, "customer_name": "Jan", "mpn": "L1", "qty": qty, "is_first_in_order": True}
+
+
+def test_unchanged_list_reuses_pending_snapshot(tmp_path):
+    store = PicklistSnapshotStore(str(tmp_path / "cache.sqlite3"))
+    rows = [_row("#1"), _row("#2")]
+
+    first = store.save("shop", rows, printed=False)
+    assert store.save("shop", [dict(r) for r in rows], printed=False) == first
+
+    assert store.mark_printed("shop", first)
+    # Na printen: zelfde inhoud blijft naar de geprinte snapshot wijzen
+    assert store.save("shop", rows, printed=False) == first
+
+    changed = store.save("shop", [_row("#1"), _row("#2", qty=2)], printed=False)
+    assert changed != first
+    assert store.latest("shop")["id"] == first
+
+
+def test_diff_rows_uses_given_hashes():
+    base = order_hashes([_row("#1"), _row("#2")])
+    rows = [_row("#1"), _row("#2", qty=2), _row("#3")]
+
+    delta = diff_rows(rows, base, order_hashes(rows))
+
+    assert delta["added"] == ["#3"]
+    assert delta["changed"] == ["#2"]
+    assert [r["order_number"] for r in delta["rows"]] == ["#2", "#3"]
+    assert diff_rows(rows, base) == delta
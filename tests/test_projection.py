@@ -0,0 +1,53 @@
+from app.services import projection
+
+
+def _bare_order():
+    # Zoals de REST order binnenkomt: klant zonder naamvelden
+    return {
+        "id": 1,
+        "name": "#1001",
+        "updated_at": "2026-03-01T10:00:00Z",
+        "customer": {"id": 55, "updated_at": "2026-02-01T09:00:00Z"},
+        "line_items": [],
+    }
+
+
+def _enriched_order():
+    # Na _load_orders: volledige klant via get_customer(), zelfde id/updated_at
+    order = _bare_order()
+    order["customer"] = {
+        "id": 55,
+        "updated_at": "2026-02-01T09:00:00Z",
+        "first_name": "Jan",
+        "last_name": "Jansen",
+    }
+    return order
+
+
+def test_enriched_customer_is_not_served_from_bare_projection():
+    projection._cache.clear()
+
+    bare = projection.project_order(_bare_order())
+    enriched = projection.project_order(_enriched_order())
+
+    assert bare["account_name"] == "-"
+    assert enriched["account_name"] == "Jan Jansen"
+    assert enriched["customer_name"] == "Jan Jansen"
+
+
+def test_same_version_is_memoized():
+    projection._cache.clear()
+
+    first = projection.project_order(_enriched_order())
+    second = projection.project_order(_enriched_order())
+
+    assert first is second
+
+
+def test_pick_name_changes_version():
+    order = _enriched_order()
+    before = projection.order_version(order)
+    order["pick_klantnaam"] = "Magazijn Jansen"
+
+    assert projection.order_version(order) != before
+    assert projection.project_order(order)["customer_name"] == "Magazijn Jansen"
@@ -0,0 +1,64 @@
+import pytest
+
+from app.services import projection
+from app.services.waves import WaveIndex
+
+
+@pytest.fixture(autouse=True)
+def _clear_projection_memo():
+    # project_order onthoudt per order versie; elke test bouwt zijn eigen orders
+    projection._cache.clear()
+
+
+def _order(n, qty=1, customer=None, updated_at="2026-03-01T10:00:00Z"):
+    return {
+        "id": n,
+        "name": f"#{n}",
+        "updated_at": updated_at,
+        "customer": customer or {"id": 50 + n},
+        "shipping_lines": [{"title": "Pakket"}],
+        "line_items": [{"title": "Lamp", "sku": "L1", "quantity": qty, "price": "2.50"}],
+    }
+
+
+def test_sync_skips_unchanged_orders():
+    index = WaveIndex()
+    assert index.sync([_order(1), _order(2)]) == {"added": 2, "removed": 0, "updated": 0}
+    assert index.sync([_order(1), _order(2)]) == {"added": 0, "removed": 0, "updated": 0}
+
+    [wave] = index.rows()
+    assert wave["total_qty"] == 2
+    assert wave["order_count"] == 2
+
+
+def test_sync_applies_removed_and_changed_orders():
+    index = WaveIndex()
+    index.sync([_order(1), _order(2)])
+
+    stats = index.sync([_order(2, qty=3, updated_at="2026-03-01T11:00:00Z")])
+
+    assert stats == {"added": 0, "removed": 1, "updated": 1}
+    [wave] = index.rows()
+    assert wave["total_qty"] == 3
+    assert [e["order_number"] for e in wave["orders"]] == ["#2"]
+
+
+def test_sync_picks_up_customer_enrichment_without_new_updated_at():
+    index = WaveIndex()
+    index.sync([_order(1)])
+    assert index.rows()[0]["orders"][0]["customer_name"] == "-"
+
+    enriched = _order(1, customer={"id": 51, "first_name": "Jan", "last_name": "Jansen"})
+    assert index.sync([enriched])["updated"] == 1
+    assert index.rows()[0]["orders"][0]["customer_name"] == "Jan Jansen"
+
+
+def test_wave_label_follows_remaining_orders():
+    old = _order(1)
+    old["line_items"][0]["title"] = "Lamp (oude naam)"
+    index = WaveIndex()
+    index.sync([old, _order(2)])
+
+    index.sync([_order(2)])
+
+    assert index.rows()[0]["product_name"] == "Lamp"